@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+FRED Explorer Conditional Request Cache
+Remembers response validators so repeat FRED requests can be answered with 304 Not Modified
+"""
+
+from collections import OrderedDict
+
+# Total response bytes kept per client, and the largest single body worth keeping;
+# bigger observation payloads are simply re-fetched in full
+CONDITIONAL_CACHE_MAX_BYTES = 16 * 1024 * 1024
+CONDITIONAL_CACHE_MAX_BODY = 2 * 1024 * 1024
+
+class ConditionalCache:
+    """LRU of (etag, last_modified, body) per request, bounded by total body size"""
+    
+    def __init__(self, max_bytes: int = CONDITIONAL_CACHE_MAX_BYTES, max_body: int = CONDITIONAL_CACHE_MAX_BODY):
+        self.max_bytes = max_bytes
+        self.max_body = max_body
+        self._entries = OrderedDict()  # request key -> (etag, last_modified, body)
+        self._size = 0
+    
+    @staticmethod
+    def _key(endpoint: str, params: dict = None):
+        """Cache key for an endpoint and its per-call query params"""
+        return (endpoint, tuple(sorted((params or {}).items())))
+    
+    def get(self, endpoint: str, params: dict = None):
+        """Get the remembered entry for a request, or None"""
+        key = self._key(endpoint, params)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+    
+    def remember(self, endpoint: str, params: dict, response):
+        """Keep ETag/Last-Modified and the body of a 200 response for conditional re-fetches"""
+        key = self._key(endpoint, params)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        body = response.content
+        
+        self._discard(key)
+        if (not etag and not last_modified) or len(body) > self.max_body:
+            return
+        
+        self._entries[key] = (etag, last_modified, body)
+        self._size += len(body)
+        while self._size > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+    
+    def _discard(self, key):
+        """Drop an entry, e.g. one superseded by a newer response"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[2])
+
+def conditional_headers(entry):
+    """If-None-Match/If-Modified-Since headers for a remembered entry"""
+    if entry is None:
+        return None
+    etag, last_modified, _ = entry
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
@@ -4,26 +4,77 @@ FRED Explorer Database Models and Operations
 SQLite database for caching FRED API data
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey
+from sqlalchemy import MetaData, create_engine, event, select, func, bindparam, lambda_stmt, Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from datetime import datetime, timezone
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import asyncio
 import json
 import os
+import time
+from observation_store import ObservationStore
 
 # Database configuration
+# Bump SCHEMA_VERSION when a table definition changes; the cache tables are rebuilt on mismatch
+SCHEMA_VERSION = 4
 DATABASE_URL = "sqlite+aiosqlite:///./fred_data.db"
 SYNC_DATABASE_URL = "sqlite:///./fred_data.db"
 
+# Per-connection prepared statement cache size for the sqlite3 driver; the
+# pool keeps connections open, so each statement is parsed once per connection
+SQLITE_CONNECT_ARGS = {"cached_statements": 256}
+
 # Create async engine
-async_engine = create_async_engine(DATABASE_URL, echo=False)
+async_engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    query_cache_size=1200,
+    connect_args=SQLITE_CONNECT_ARGS
+)
 AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
 # Create sync engine for initialization
-sync_engine = create_engine(SYNC_DATABASE_URL, echo=False)
+sync_engine = create_engine(SYNC_DATABASE_URL, echo=False, connect_args=SQLITE_CONNECT_ARGS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
 
+# SQLite tuning applied to every new connection; synchronous=NORMAL avoids an
+# fsync per commit once the database is in WAL mode (set by _create_schema)
+SQLITE_PRAGMAS = (
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",  # ~64 MB page cache
+    "PRAGMA mmap_size=268435456",  # 256 MB
+)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLite PRAGMAs when the pool opens a new connection"""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+def _optimize_on_close(dbapi_connection, connection_record):
+    """Let SQLite refresh planner statistics it considers stale before a connection closes"""
+    try:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA optimize")
+        cursor.close()
+    except Exception as e:
+        # Best effort only; closing must not fail because of it
+        print(f"PRAGMA optimize skipped: {e}")
+
+event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+event.listen(async_engine.sync_engine, "close", _optimize_on_close)
+event.listen(sync_engine, "close", _optimize_on_close)
+
+# Seconds between ANALYZE / WAL checkpoint runs of the housekeeping loop
+HOUSEKEEPING_INTERVAL = 3600
+
 Base = declarative_base()
 
 class Release(Base):
@@ -75,29 +126,6 @@ class Series(Base):
     
     # Relationships
     release = relationship("Release", back_populates="series")
-    observations = relationship("Observation", back_populates="series")
-
-class Observation(Base):
-    """FRED Observation model"""
-    __tablename__ = "observations"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    series_id = Column(String, ForeignKey("series.id"), nullable=False, index=True)
-    date = Column(String, nullable=False, index=True)
-    value = Column(String)  # Store as string to handle "." values
-    realtime_start = Column(String)
-    realtime_end = Column(String)
-    
-    # Timestamps
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    
-    # Relationships
-    series = relationship("Series", back_populates="observations")
-    
-    # Composite index for efficient queries
-    __table_args__ = (
-        {"sqlite_autoincrement": True}
-    )
 
 class CacheMetadata(Base):
     """Cache metadata for tracking data freshness"""
@@ -113,10 +141,88 @@ class CacheMetadata(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
+# Prebuilt statements: constructed once so hot methods only bind parameters
+# Reads select only the columns the API returns and yield plain row mappings, no ORM instances
+_RELEASE_COLUMNS = [
+    Release.__table__.c[name]
+    for name in ('id', 'name', 'press_release', 'link', 'notes', 'realtime_start', 'realtime_end')
+]
+_SERIES_COLUMNS = [
+    Series.__table__.c[name]
+    for name in (
+        'id', 'title', 'frequency', 'frequency_short', 'units', 'units_short',
+        'seasonal_adjustment', 'seasonal_adjustment_short', 'last_updated',
+        'popularity', 'group_popularity', 'notes',
+        'realtime_start', 'realtime_end', 'observation_start', 'observation_end'
+    )
+]
+_SEL_RELEASES = select(*_RELEASE_COLUMNS).limit(bindparam("lim"))
+_SEL_RELEASE_BY_ID = select(*_RELEASE_COLUMNS).where(Release.id == bindparam("rid"))
+_SEL_SERIES = select(*_SERIES_COLUMNS).limit(bindparam("lim"))
+_SEL_SERIES_BY_RELEASE = select(*_SERIES_COLUMNS).where(Series.release_id == bindparam("rid")).limit(bindparam("lim"))
+_SEL_TABLE_COUNTS = select(
+    select(func.count(Release.id)).scalar_subquery().label("releases"),
+    select(func.count(Series.id)).scalar_subquery().label("series"),
+    select(func.count(CacheMetadata.id)).scalar_subquery().label("cache_entries")
+)
+_UPSERT_CACHE_META = sqlite_insert(CacheMetadata)
+_UPSERT_CACHE_META = _UPSERT_CACHE_META.on_conflict_do_update(
+    index_elements=['cache_key'],
+    set_={name: _UPSERT_CACHE_META.excluded[name] for name in ('last_fetched', 'expires_at', 'data_count', 'updated_at')}
+)
+# is_cache_valid runs before every request; a lambda statement memoizes the
+# whole construction and only the expiry column is fetched
+_SEL_CACHE_EXPIRY = lambda_stmt(
+    lambda: select(CacheMetadata.expires_at).where(CacheMetadata.cache_key == bindparam("k"))
+)
+
+def _cache_meta_row(cache_key: str, cache_type: str, data_count: int, now: datetime, expires_hours: int):
+    """Parameters for one _UPSERT_CACHE_META row"""
+    return {
+        "cache_key": cache_key,
+        "cache_type": cache_type,
+        "last_fetched": now,
+        "expires_at": now + timedelta(hours=expires_hours),
+        "data_count": data_count,
+        "created_at": now,
+        "updated_at": now
+    }
+
+def _build_upsert(table, records: list):
+    """
+    Build a single INSERT ... ON CONFLICT(id) DO UPDATE for a batch of API records.
+    Returns the statement and the executemany parameter list; only columns that
+    appear in the records are written, so existing values for absent fields are kept.
+    Timestamps are taken once for the whole batch rather than per row by column defaults.
+    """
+    columns = [
+        c.name for c in table.columns
+        if c.name not in ('created_at', 'updated_at') and any(c.name in record for record in records)
+    ]
+    now = datetime.now(timezone.utc)
+    rows = [
+        {**{name: record.get(name) for name in columns}, 'created_at': now, 'updated_at': now}
+        for record in records
+    ]
+    
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['id'],
+        set_={name: stmt.excluded[name] for name in columns + ['updated_at'] if name != 'id'}
+    )
+    return stmt, rows
+
+# In-process memo of is_cache_valid results: cache_key -> (monotonic deadline, valid).
+# Keys come from client-supplied limits and date ranges, so it is a size-capped LRU
+VALIDITY_CACHE_TTL = 30  # seconds
+VALIDITY_CACHE_SIZE = 1024
+_VALIDITY_CACHE: OrderedDict[str, tuple[float, bool]] = OrderedDict()
+
 # Database operations class
 class FREDDatabase:
     def __init__(self):
         self.async_session = AsyncSessionLocal
+        self.observation_store = ObservationStore()
     
     async def get_session(self):
         """Get async database session"""
@@ -126,200 +232,224 @@ class FREDDatabase:
     async def init_db(self):
         """Initialize database tables"""
         async with async_engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_create_schema)
     
     async def get_releases(self, limit: int = 50):
-        """Get cached releases"""
+        """Get cached releases as dictionaries"""
         async with self.async_session() as session:
-            from sqlalchemy import select
-            stmt = select(Release).limit(limit)
-            result = await session.execute(stmt)
-            return result.scalars().all()
+            result = await session.execute(_SEL_RELEASES, {"lim": limit})
+            return [dict(row) for row in result.mappings()]
     
-    async def store_releases(self, releases_data: list):
-        """Store releases in database"""
+    async def get_release(self, release_id: int):
+        """Get a single cached release as a dictionary"""
         async with self.async_session() as session:
-            try:
-                for release_data in releases_data:
-                    # Check if release exists
-                    from sqlalchemy import select
-                    stmt = select(Release).where(Release.id == release_data['id'])
-                    result = await session.execute(stmt)
-                    existing = result.scalar_one_or_none()
-                    
-                    if existing:
-                        # Update existing
-                        for key, value in release_data.items():
-                            if hasattr(existing, key):
-                                setattr(existing, key, value)
-                        existing.updated_at = datetime.now(timezone.utc)
-                    else:
-                        # Create new
-                        release = Release(**release_data)
-                        session.add(release)
-                
-                await session.commit()
-                return True
-            except Exception as e:
-                await session.rollback()
-                print(f"Error storing releases: {e}")
-                return False
+            result = await session.execute(_SEL_RELEASE_BY_ID, {"rid": release_id})
+            row = result.mappings().one_or_none()
+            return dict(row) if row else None
+    
+    async def store_releases(self, releases_data: list, session: AsyncSession = None):
+        """Store releases in database; when a session is passed the caller commits"""
+        if session is None:
+            return await self._commit(lambda s: self.store_releases(releases_data, s), "releases")
+        
+        stmt, rows = _build_upsert(Release.__table__, releases_data)
+        await session.execute(stmt, rows)
+        return True
     
     async def get_series(self, release_id: int = None, limit: int = 50):
-        """Get cached series"""
+        """Get cached series as dictionaries"""
         async with self.async_session() as session:
-            from sqlalchemy import select
-            stmt = select(Series)
             if release_id:
-                stmt = stmt.where(Series.release_id == release_id)
-            stmt = stmt.limit(limit)
-            result = await session.execute(stmt)
-            return result.scalars().all()
+                result = await session.execute(_SEL_SERIES_BY_RELEASE, {"rid": release_id, "lim": limit})
+            else:
+                result = await session.execute(_SEL_SERIES, {"lim": limit})
+            return [dict(row) for row in result.mappings()]
+    
+    async def store_series(self, series_data: list, release_id: int = None, session: AsyncSession = None):
+        """Store series in database; when a session is passed the caller commits"""
+        if session is None:
+            return await self._commit(lambda s: self.store_series(series_data, release_id, s), "series")
+        
+        # Add release_id if provided
+        if release_id:
+            series_data = [{**series_item, 'release_id': release_id} for series_item in series_data]
+        
+        stmt, rows = _build_upsert(Series.__table__, series_data)
+        await session.execute(stmt, rows)
+        return True
     
-    async def store_series(self, series_data: list, release_id: int = None):
-        """Store series in database"""
+    async def get_observations(self, series_id: str, limit: int = 1000, observation_start: str = None, observation_end: str = None):
+        """Get cached observations for a series as the matching FRED request returned them, newest first"""
+        observations = await asyncio.to_thread(
+            self.observation_store.read, series_id, limit, observation_start, observation_end
+        )
+        return observations or []
+    
+    async def store_observations(self, observations_data: list, series_id: str, raise_errors: bool = False):
+        """Store observations in the per-series file store; raise_errors lets a store_and_mark writer see failures"""
+        try:
+            await asyncio.to_thread(self.observation_store.write, series_id, observations_data)
+            return True
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error storing observations: {e}")
+            return False
+    
+    async def _upsert_cache_meta(self, session: AsyncSession, cache_key: str, cache_type: str, data_count: int = 0, expires_hours: int = 24):
+        """Write a cache metadata row in an open session"""
+        now = datetime.now(timezone.utc)
+        await session.execute(_UPSERT_CACHE_META, _cache_meta_row(cache_key, cache_type, data_count, now, expires_hours))
+    
+    async def store_observations_batch(self, batch: list, expires_hours: int = 24):
+        """
+        Store observations for several series as one write: each series gets its file,
+        then cache metadata for the whole batch goes in one executemany and a single
+        commit. batch holds (series_id, cache_key, observations_data)
+        """
         async with self.async_session() as session:
             try:
-                for series_item in series_data:
-                    # Check if series exists
-                    from sqlalchemy import select
-                    stmt = select(Series).where(Series.id == series_item['id'])
-                    result = await session.execute(stmt)
-                    existing = result.scalar_one_or_none()
-                    
-                    # Add release_id if provided
-                    if release_id:
-                        series_item['release_id'] = release_id
-                    
-                    if existing:
-                        # Update existing
-                        for key, value in series_item.items():
-                            if hasattr(existing, key):
-                                setattr(existing, key, value)
-                        existing.updated_at = datetime.now(timezone.utc)
-                    else:
-                        # Create new
-                        series = Series(**series_item)
-                        session.add(series)
+                for series_id, _, observations_data in batch:
+                    await asyncio.to_thread(self.observation_store.write, series_id, observations_data)
                 
+                # Executemany runs at the Core level on the session's connection
+                connection = await session.connection()
+                now = datetime.now(timezone.utc)
+                await connection.execute(_UPSERT_CACHE_META, [
+                    _cache_meta_row(cache_key, 'observations', len(observations_data), now, expires_hours)
+                    for _, cache_key, observations_data in batch
+                ])
                 await session.commit()
+                for _, cache_key, _ in batch:
+                    _VALIDITY_CACHE.pop(cache_key, None)
                 return True
             except Exception as e:
                 await session.rollback()
-                print(f"Error storing series: {e}")
+                print(f"Error storing observations batch: {e}")
                 return False
     
-    async def get_observations(self, series_id: str, limit: int = 1000):
-        """Get cached observations for a series"""
+    async def update_cache_metadata(self, cache_key: str, cache_type: str, data_count: int = 0, expires_hours: int = 24):
+        """Update cache metadata"""
         async with self.async_session() as session:
-            from sqlalchemy import select, desc
-            stmt = select(Observation).where(
-                Observation.series_id == series_id
-            ).order_by(desc(Observation.date)).limit(limit)
-            result = await session.execute(stmt)
-            return result.scalars().all()
+            try:
+                await self._upsert_cache_meta(session, cache_key, cache_type, data_count, expires_hours)
+                await session.commit()
+                _VALIDITY_CACHE.pop(cache_key, None)
+                return True
+            except Exception as e:
+                await session.rollback()
+                print(f"Error updating cache metadata: {e}")
+                return False
     
-    async def store_observations(self, observations_data: list, series_id: str):
-        """Store observations in database"""
+    async def store_and_mark(self, writer, cache_key: str, cache_type: str, data_count: int = 0, expires_hours: int = 24):
+        """
+        Run a store_* writer and record its cache metadata in one transaction,
+        so a fetched API response costs a single commit
+        """
         async with self.async_session() as session:
             try:
-                # Delete existing observations for this series to avoid duplicates
-                from sqlalchemy import delete
-                delete_stmt = delete(Observation).where(Observation.series_id == series_id)
-                await session.execute(delete_stmt)
-                
-                # Insert new observations
-                for obs_data in observations_data:
-                    obs_data['series_id'] = series_id
-                    observation = Observation(**obs_data)
-                    session.add(observation)
-                
+                await writer(session)
+                await self._upsert_cache_meta(session, cache_key, cache_type, data_count, expires_hours)
                 await session.commit()
+                _VALIDITY_CACHE.pop(cache_key, None)
                 return True
             except Exception as e:
                 await session.rollback()
-                print(f"Error storing observations: {e}")
+                print(f"Error storing {cache_type}: {e}")
                 return False
     
-    async def update_cache_metadata(self, cache_key: str, cache_type: str, data_count: int = 0, expires_hours: int = 24):
-        """Update cache metadata"""
+    async def _commit(self, writer, description: str):
+        """Run a store_* writer in its own transaction"""
         async with self.async_session() as session:
             try:
-                from sqlalchemy import select
-                from datetime import timedelta
-                
-                stmt = select(CacheMetadata).where(CacheMetadata.cache_key == cache_key)
-                result = await session.execute(stmt)
-                existing = result.scalar_one_or_none()
-                
-                now = datetime.now(timezone.utc)
-                expires_at = now + timedelta(hours=expires_hours)
-                
-                if existing:
-                    existing.last_fetched = now
-                    existing.expires_at = expires_at
-                    existing.data_count = data_count
-                    existing.updated_at = now
-                else:
-                    metadata = CacheMetadata(
-                        cache_key=cache_key,
-                        cache_type=cache_type,
-                        last_fetched=now,
-                        expires_at=expires_at,
-                        data_count=data_count
-                    )
-                    session.add(metadata)
-                
+                await writer(session)
                 await session.commit()
                 return True
             except Exception as e:
                 await session.rollback()
-                print(f"Error updating cache metadata: {e}")
+                print(f"Error storing {description}: {e}")
                 return False
     
     async def is_cache_valid(self, cache_key: str):
         """Check if cache is still valid"""
+        entry = _VALIDITY_CACHE.get(cache_key)
+        if entry:
+            if entry[0] > time.monotonic():
+                _VALIDITY_CACHE.move_to_end(cache_key)
+                return entry[1]
+            del _VALIDITY_CACHE[cache_key]
+        
         async with self.async_session() as session:
-            from sqlalchemy import select
-            stmt = select(CacheMetadata).where(CacheMetadata.cache_key == cache_key)
-            result = await session.execute(stmt)
-            metadata = result.scalar_one_or_none()
-            
-            if not metadata:
-                return False
-            
-            now = datetime.now(timezone.utc)
+            result = await session.execute(_SEL_CACHE_EXPIRY, {"k": cache_key})
+            expires_at = result.scalar_one_or_none()
+        
+        valid = False
+        if expires_at:
             # Ensure expires_at is timezone-aware
-            expires_at = metadata.expires_at
             if expires_at.tzinfo is None:
                 expires_at = expires_at.replace(tzinfo=timezone.utc)
-            
-            return expires_at > now
+            valid = expires_at > datetime.now(timezone.utc)
+        
+        _VALIDITY_CACHE[cache_key] = (time.monotonic() + VALIDITY_CACHE_TTL, valid)
+        _VALIDITY_CACHE.move_to_end(cache_key)
+        if len(_VALIDITY_CACHE) > VALIDITY_CACHE_SIZE:
+            _VALIDITY_CACHE.popitem(last=False)
+        return valid
+    
+    async def run_housekeeping(self):
+        """Refresh query planner statistics and truncate the WAL file"""
+        async with async_engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.exec_driver_sql("ANALYZE")
+            await conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    async def housekeeping_loop(self, interval: int = HOUSEKEEPING_INTERVAL):
+        """Run housekeeping periodically until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.run_housekeeping()
+            except Exception as e:
+                print(f"Error during database housekeeping: {e}")
     
     async def get_database_stats(self):
         """Get database statistics"""
         async with self.async_session() as session:
-            from sqlalchemy import select, func
-            
-            # Count records in each table
-            releases_count = await session.execute(select(func.count(Release.id)))
-            series_count = await session.execute(select(func.count(Series.id)))
-            observations_count = await session.execute(select(func.count(Observation.id)))
-            cache_count = await session.execute(select(func.count(CacheMetadata.id)))
+            # Count records in each table with a single statement
+            result = await session.execute(_SEL_TABLE_COUNTS)
+            counts = result.one()
+            stored_observations = await asyncio.to_thread(self.observation_store.count)
             
             return {
-                "releases": releases_count.scalar(),
-                "series": series_count.scalar(),
-                "observations": observations_count.scalar(),
-                "cache_entries": cache_count.scalar(),
+                "releases": counts.releases,
+                "series": counts.series,
+                "observations": stored_observations,
+                "cache_entries": counts.cache_entries,
                 "database_file": "fred_data.db",
                 "database_exists": os.path.exists("fred_data.db")
             }
 
+def _create_schema(connection):
+    """Create tables, rebuilding the cache if it was written with an older schema"""
+    # WAL lets cache reads proceed while a store_* call is writing; the mode is
+    # persistent on the file, so it is set once here rather than per connection
+    if connection.engine.url.database not in (None, "", ":memory:"):
+        connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+    
+    version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+    if version != SCHEMA_VERSION:
+        # Reflect what is on disk so tables dropped from the models go too
+        existing = MetaData()
+        existing.reflect(connection)
+        existing.drop_all(connection)
+        connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    Base.metadata.create_all(connection)
+
 # Initialize database function
 def init_database():
     """Initialize database synchronously"""
-    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as connection:
+        _create_schema(connection)
     print("✅ Database initialized successfully")
 
 # Global database instance
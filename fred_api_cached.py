@@ -5,126 +5,189 @@ Combines FRED API access with local SQLite caching for improved performance
 """
 
 import os
-import requests
+import httpx
 import json
+import logging
+import orjson
 import asyncio
+import time
+from collections import OrderedDict
+from types import MappingProxyType
 from datetime import datetime, timezone
 from dotenv import load_dotenv
+from conditional_cache import ConditionalCache, conditional_headers
 from database import FREDDatabase, init_database
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Maximum concurrent series observation fetches per release request
+OBSERVATION_FETCH_CONCURRENCY = 8
+
+# In-process LRU for small, hot release/series metadata responses
+METADATA_CACHE_TTL = 300  # seconds
+METADATA_CACHE_SIZE = 512
+
 class FREDAPICached:
     def __init__(self):
         self.api_key = os.getenv('FRED_API_KEY')
         self.base_url = os.getenv('FRED_BASE_URL', 'https://api.stlouisfed.org/fred')
         self.db = FREDDatabase()
+        self._http = None
+        self._metadata_cache = OrderedDict()  # key -> (monotonic deadline, response)
+        self._conditional = ConditionalCache()
         
         if not self.api_key:
             raise ValueError("FRED_API_KEY not found in environment variables. Check your .env file.")
         
+        # Read-only so no request path can mutate the shared defaults
+        self._default_params = MappingProxyType({'api_key': self.api_key, 'file_type': 'json'})
+        
         # Initialize database
         init_database()
     
-    def make_request(self, endpoint, params=None):
+    @property
+    def http(self):
+        """Shared pooled HTTP client, created on first use"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                params=self._default_params,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+                headers={'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'},
+                timeout=30.0
+            )
+        return self._http
+    
+    async def close(self):
+        """Close the pooled HTTP client"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+    
+    async def make_request(self, endpoint, params=None):
         """Make a request to the FRED API"""
-        if params is None:
-            params = {}
-        
-        params['api_key'] = self.api_key
-        params.setdefault('file_type', 'json')
-        
-        url = f"{self.base_url}/{endpoint}"
-        response = requests.get(url, params=params)
-        
-        print(f"Request: {endpoint}")
-        print(f"Status: {response.status_code}")
-        
-        if response.status_code == 200:
-            return response.json()
+        # Relative to the client's base_url; httpx merges the default params
+        cached = self._conditional.get(endpoint, params)
+        response = await self.http.get(endpoint, params=params, headers=conditional_headers(cached))
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Request: %s Status: %s", endpoint, response.status_code)
+        
+        if response.status_code == 304 and cached is not None:
+            # Unchanged since the last fetch: re-parse the stored body so callers get their own copy
+            return orjson.loads(cached[2])
+        elif response.status_code == 200:
+            self._conditional.remember(endpoint, params, response)
+            return orjson.loads(response.content)
         else:
-            print(f"Error: {response.text}")
+            logger.error("Error: %s %s", endpoint, response.text)
             return None
     
     async def get_releases_cached(self, limit=50, force_refresh=False):
         """Get releases with caching"""
+        # In-process cache first; it never holds results past METADATA_CACHE_TTL
+        memo_key = ('releases', limit)
+        if not force_refresh:
+            memoized = self._memo_get(memo_key)
+            if memoized is not None:
+                return memoized
+        
         cache_key = f"releases_limit_{limit}"
         
         # Check cache first (unless force refresh)
         if not force_refresh and await self.db.is_cache_valid(cache_key):
-            print("📦 Loading releases from cache...")
+            logger.debug("📦 Loading releases from cache...")
             cached_releases = await self.db.get_releases(limit)
             if cached_releases:
-                return {
-                    'releases': [self._release_to_dict(r) for r in cached_releases],
+                return self._memo_put(memo_key, {
+                    'releases': cached_releases,
                     'count': len(cached_releases),
                     'cached': True
-                }
+                })
         
         # Fetch from API
-        print("🌐 Fetching releases from FRED API...")
-        data = self.make_request('releases', {'limit': limit})
+        logger.debug("🌐 Fetching releases from FRED API...")
+        data = await self.make_request('releases', {'limit': limit})
         if not data:
             return None
         
         # Store in database
         releases_data = data.get('releases', [])
         if releases_data:
-            await self.db.store_releases(releases_data)
-            await self.db.update_cache_metadata(cache_key, 'releases', len(releases_data))
+            await self.db.store_and_mark(
+                lambda session: self.db.store_releases(releases_data, session=session),
+                cache_key, 'releases', len(releases_data)
+            )
         
         data['cached'] = False
-        return data
+        return self._memo_put(memo_key, data)
     
     async def get_release_info_cached(self, release_id, force_refresh=False):
         """Get release info with caching"""
+        # In-process cache first; it never holds results past METADATA_CACHE_TTL
+        memo_key = ('release', release_id)
+        if not force_refresh:
+            memoized = self._memo_get(memo_key)
+            if memoized is not None:
+                return memoized
+        
         cache_key = f"release_{release_id}"
         
         # Check cache first
         if not force_refresh and await self.db.is_cache_valid(cache_key):
-            print(f"📦 Loading release {release_id} from cache...")
-            cached_releases = await self.db.get_releases(1)
-            for release in cached_releases:
-                if release.id == release_id:
-                    return {
-                        'releases': [self._release_to_dict(release)],
-                        'cached': True
-                    }
+            logger.debug("📦 Loading release %s from cache...", release_id)
+            release = await self.db.get_release(release_id)
+            if release:
+                return self._memo_put(memo_key, {
+                    'releases': [release],
+                    'cached': True
+                })
         
         # Fetch from API
-        print(f"🌐 Fetching release {release_id} from FRED API...")
-        data = self.make_request('release', {'release_id': release_id})
+        logger.debug("🌐 Fetching release %s from FRED API...", release_id)
+        data = await self.make_request('release', {'release_id': release_id})
         if not data:
             return None
         
         # Store in database
         releases_data = data.get('releases', [])
         if releases_data:
-            await self.db.store_releases(releases_data)
-            await self.db.update_cache_metadata(cache_key, 'release', 1)
+            await self.db.store_and_mark(
+                lambda session: self.db.store_releases(releases_data, session=session),
+                cache_key, 'release', 1
+            )
         
         data['cached'] = False
-        return data
+        return self._memo_put(memo_key, data)
     
     async def get_release_series_cached(self, release_id, limit=50, force_refresh=False):
         """Get release series with caching"""
+        # In-process cache first; it never holds results past METADATA_CACHE_TTL
+        memo_key = ('release/series', release_id, limit)
+        if not force_refresh:
+            memoized = self._memo_get(memo_key)
+            if memoized is not None:
+                return memoized
+        
         cache_key = f"series_release_{release_id}_limit_{limit}"
         
         # Check cache first
         if not force_refresh and await self.db.is_cache_valid(cache_key):
-            print(f"📦 Loading series for release {release_id} from cache...")
+            logger.debug("📦 Loading series for release %s from cache...", release_id)
             cached_series = await self.db.get_series(release_id, limit)
             if cached_series:
-                return {
-                    'seriess': [self._series_to_dict(s) for s in cached_series],
+                return self._memo_put(memo_key, {
+                    'seriess': cached_series,
                     'count': len(cached_series),
                     'cached': True
-                }
+                })
         
         # Fetch from API
-        print(f"🌐 Fetching series for release {release_id} from FRED API...")
-        data = self.make_request('release/series', {
+        logger.debug("🌐 Fetching series for release %s from FRED API...", release_id)
+        data = await self.make_request('release/series', {
             'release_id': release_id,
             'limit': limit
         })
@@ -134,14 +197,19 @@ class FREDAPICached:
         # Store in database
         series_data = data.get('seriess', [])
         if series_data:
-            await self.db.store_series(series_data, release_id)
-            await self.db.update_cache_metadata(cache_key, 'series', len(series_data))
+            await self.db.store_and_mark(
+                lambda session: self.db.store_series(series_data, release_id, session=session),
+                cache_key, 'series', len(series_data)
+            )
         
         data['cached'] = False
-        return data
+        return self._memo_put(memo_key, data)
     
-    async def get_series_observations_cached(self, series_id, limit=1000, force_refresh=False, **kwargs):
-        """Get series observations with caching"""
+    async def get_series_observations_cached(self, series_id, limit=1000, force_refresh=False, pending=None, **kwargs):
+        """
+        Get series observations with caching; when a pending list is passed the
+        fetched observations are queued on it for a batched store instead of written here
+        """
         cache_key = f"observations_{series_id}_limit_{limit}"
         
         # Add date parameters to cache key if provided
@@ -151,17 +219,19 @@ class FREDAPICached:
         
         # Check cache first
         if not force_refresh and await self.db.is_cache_valid(cache_key):
-            print(f"📦 Loading observations for {series_id} from cache...")
-            cached_obs = await self.db.get_observations(series_id, limit)
+            logger.debug("📦 Loading observations for %s from cache...", series_id)
+            cached_obs = await self.db.get_observations(
+                series_id, limit, kwargs.get('observation_start'), kwargs.get('observation_end')
+            )
             if cached_obs:
                 return {
-                    'observations': [self._observation_to_dict(o) for o in cached_obs],
+                    'observations': cached_obs,
                     'count': len(cached_obs),
                     'cached': True
                 }
         
         # Fetch from API
-        print(f"🌐 Fetching observations for {series_id} from FRED API...")
+        logger.debug("🌐 Fetching observations for %s from FRED API...", series_id)
         params = {
             'series_id': series_id,
             'limit': limit
@@ -172,15 +242,19 @@ class FREDAPICached:
             if param in kwargs:
                 params[param] = kwargs[param]
         
-        data = self.make_request('series/observations', params)
+        data = await self.make_request('series/observations', params)
         if not data:
             return None
         
         # Store in database
         observations_data = data.get('observations', [])
-        if observations_data:
-            await self.db.store_observations(observations_data, series_id)
-            await self.db.update_cache_metadata(cache_key, 'observations', len(observations_data))
+        if observations_data and pending is not None:
+            pending.append((series_id, cache_key, observations_data))
+        elif observations_data:
+            await self.db.store_and_mark(
+                lambda session: self.db.store_observations(observations_data, series_id, raise_errors=True),
+                cache_key, 'observations', len(observations_data)
+            )
         
         data['cached'] = False
         return data
@@ -189,16 +263,14 @@ class FREDAPICached:
         """
         Enhanced workaround for release observations with caching
         """
-        print(f"\n=== Getting Release Observations with Caching (Release ID: {release_id}) ===")
-        
-        # Get release info
-        release_info = await self.get_release_info_cached(release_id, force_refresh)
-        if not release_info:
-            return None
+        logger.debug("Getting release observations with caching (release %s)", release_id)
         
-        # Get series in the release
-        series_data = await self.get_release_series_cached(release_id, series_limit, force_refresh)
-        if not series_data:
+        # Get release info and the series in the release concurrently
+        release_info, series_data = await asyncio.gather(
+            self.get_release_info_cached(release_id, force_refresh),
+            self.get_release_series_cached(release_id, series_limit, force_refresh)
+        )
+        if not release_info or not series_data:
             return None
         
         # Build combined response
@@ -213,12 +285,27 @@ class FREDAPICached:
             }
         }
         
-        # Get observations for each series
-        for series in series_data['seriess']:
-            series_id = series['id']
-            print(f"  Getting observations for: {series_id}")
-            
-            obs_data = await self.get_series_observations_cached(series_id, obs_limit, force_refresh)
+        # Get observations for all series concurrently
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Release %s: getting observations for %s", release_id, ', '.join(s['id'] for s in series_data['seriess']))
+        semaphore = asyncio.Semaphore(OBSERVATION_FETCH_CONCURRENCY)
+        pending = []
+        
+        async def fetch_observations(series):
+            async with semaphore:
+                return await self.get_series_observations_cached(series['id'], obs_limit, force_refresh, pending=pending)
+        
+        # A failed series must not discard the ones already fetched into pending
+        obs_results = await asyncio.gather(*[fetch_observations(s) for s in series_data['seriess']], return_exceptions=True)
+        
+        # Write every freshly fetched series in one transaction
+        if pending:
+            await self.db.store_observations_batch(pending)
+        
+        for series, obs_data in zip(series_data['seriess'], obs_results):
+            if isinstance(obs_data, Exception):
+                logger.error("Error getting observations for %s: %s", series['id'], obs_data)
+                continue
             if obs_data and 'observations' in obs_data:
                 series_with_obs = series.copy()
                 series_with_obs['observations'] = obs_data['observations']
@@ -227,47 +314,24 @@ class FREDAPICached:
         
         return result
     
-    def _release_to_dict(self, release):
-        """Convert Release model to dictionary"""
-        return {
-            'id': release.id,
-            'name': release.name,
-            'press_release': release.press_release,
-            'link': release.link,
-            'notes': release.notes,
-            'realtime_start': release.realtime_start,
-            'realtime_end': release.realtime_end
-        }
-    
-    def _series_to_dict(self, series):
-        """Convert Series model to dictionary"""
-        return {
-            'id': series.id,
-            'title': series.title,
-            'frequency': series.frequency,
-            'frequency_short': series.frequency_short,
-            'units': series.units,
-            'units_short': series.units_short,
-            'seasonal_adjustment': series.seasonal_adjustment,
-            'seasonal_adjustment_short': series.seasonal_adjustment_short,
-            'last_updated': series.last_updated,
-            'popularity': series.popularity,
-            'group_popularity': series.group_popularity,
-            'notes': series.notes,
-            'realtime_start': series.realtime_start,
-            'realtime_end': series.realtime_end,
-            'observation_start': series.observation_start,
-            'observation_end': series.observation_end
-        }
+    def _memo_get(self, key):
+        """Get a response from the in-process cache if it has not expired"""
+        entry = self._metadata_cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._metadata_cache[key]
+            return None
+        self._metadata_cache.move_to_end(key)
+        return entry[1]
     
-    def _observation_to_dict(self, observation):
-        """Convert Observation model to dictionary"""
-        return {
-            'date': observation.date,
-            'value': observation.value,
-            'realtime_start': observation.realtime_start,
-            'realtime_end': observation.realtime_end
-        }
+    def _memo_put(self, key, data):
+        """Remember a response in the in-process cache and return it unchanged"""
+        self._metadata_cache[key] = (time.monotonic() + METADATA_CACHE_TTL, {**data, 'cached': True})
+        self._metadata_cache.move_to_end(key)
+        if len(self._metadata_cache) > METADATA_CACHE_SIZE:
+            self._metadata_cache.popitem(last=False)
+        return data
     
     async def get_database_stats(self):
         """Get database statistics"""
@@ -275,12 +339,17 @@ class FREDAPICached:
     
     async def clear_cache(self, cache_type=None):
         """Clear cache data"""
-        # This would implement cache clearing logic
-        # For now, just return a placeholder
-        return {"message": "Cache clearing not implemented yet"}
+        self._metadata_cache.clear()
+        # Clearing the SQLite cache would be implemented here
+        # For now, only the in-process cache is dropped
+        return {"message": "In-process cache cleared; database cache clearing not implemented yet"}
 
 async def main():
     """Test the cached FRED API"""
+    # Show cache hits and API fetches for this demo
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.DEBUG)
+    
     try:
         # Initialize API client
         fred = FREDAPICached()
@@ -329,6 +398,8 @@ async def main():
         for key, value in stats.items():
             print(f"  {key}: {value}")
         
+        await fred.close()
+        
         print("\n" + "="*50)
         print("✅ All cached tests completed successfully!")
         print("💡 Run again to see caching in action!")
@@ -5,58 +5,89 @@ Uses environment variables for API key management
 """
 
 import os
-import requests
+import asyncio
+import httpx
 import json
+import logging
+import orjson
+from types import MappingProxyType
 from datetime import datetime
 from dotenv import load_dotenv
+from conditional_cache import ConditionalCache, conditional_headers
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class FREDAPISecure:
     def __init__(self):
         self.api_key = os.getenv('FRED_API_KEY')
         self.base_url = os.getenv('FRED_BASE_URL', 'https://api.stlouisfed.org/fred')
+        self._conditional = ConditionalCache()
         
         if not self.api_key:
             raise ValueError("FRED_API_KEY not found in environment variables. Check your .env file.")
+        
+        # Read-only so no request path can mutate the shared defaults
+        self._default_params = MappingProxyType({'api_key': self.api_key, 'file_type': 'json'})
+        
+        # Shared keep-alive connection pool for all FRED requests; the API key
+        # and response format are sent as client-level default params
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=True,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+            params=self._default_params,
+            headers={'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'},
+            timeout=30.0
+        )
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
     
-    def make_request(self, endpoint, params=None):
+    async def close(self):
+        """Close the pooled HTTP client"""
+        await self.client.aclose()
+    
+    async def make_request(self, endpoint, params=None):
         """Make a request to the FRED API"""
-        if params is None:
-            params = {}
-        
-        params['api_key'] = self.api_key
-        params.setdefault('file_type', 'json')
-        
-        url = f"{self.base_url}/{endpoint}"
-        response = requests.get(url, params=params)
-        
-        print(f"Request: {endpoint}")
-        print(f"Status: {response.status_code}")
-        
-        if response.status_code == 200:
-            return response.json()
+        # Relative to the client's base_url; httpx merges the default params
+        cached = self._conditional.get(endpoint, params)
+        response = await self.client.get(endpoint, params=params, headers=conditional_headers(cached))
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Request: %s Status: %s", endpoint, response.status_code)
+        
+        if response.status_code == 304 and cached is not None:
+            # Unchanged since the last fetch: re-parse the stored body so callers get their own copy
+            return orjson.loads(cached[2])
+        elif response.status_code == 200:
+            self._conditional.remember(endpoint, params, response)
+            return orjson.loads(response.content)
         else:
-            print(f"Error: {response.text}")
+            logger.error("Error: %s %s", endpoint, response.text)
             return None
     
-    def get_releases(self, limit=10):
+    async def get_releases(self, limit=10):
         """Get list of available releases"""
-        return self.make_request('releases', {'limit': limit})
+        return await self.make_request('releases', {'limit': limit})
     
-    def get_release_info(self, release_id):
+    async def get_release_info(self, release_id):
         """Get information about a specific release"""
-        return self.make_request('release', {'release_id': release_id})
+        return await self.make_request('release', {'release_id': release_id})
     
-    def get_release_series(self, release_id, limit=10):
+    async def get_release_series(self, release_id, limit=10):
         """Get series in a release"""
-        return self.make_request('release/series', {
+        return await self.make_request('release/series', {
             'release_id': release_id,
             'limit': limit
         })
     
-    def get_series_observations(self, series_id, limit=10, **kwargs):
+    async def get_series_observations(self, series_id, limit=10, **kwargs):
         """Get observations for a specific series"""
         params = {
             'series_id': series_id,
@@ -68,23 +99,19 @@ class FREDAPISecure:
             if param in kwargs:
                 params[param] = kwargs[param]
         
-        return self.make_request('series/observations', params)
+        return await self.make_request('series/observations', params)
     
-    def get_release_observations_workaround(self, release_id, series_limit=5, obs_limit=10):
+    async def get_release_observations_workaround(self, release_id, series_limit=5, obs_limit=10):
         """
         Workaround for the non-functional /release/observations endpoint
         Gets all observations for series in a release
         """
-        print(f"\n=== Getting Release Observations (Release ID: {release_id}) ===")
-        
-        # Get release info
-        release_info = self.get_release_info(release_id)
-        if not release_info:
-            return None
-        
-        # Get series in the release
-        series_data = self.get_release_series(release_id, limit=series_limit)
-        if not series_data:
+        # Get release info and the series in the release concurrently
+        release_info, series_data = await asyncio.gather(
+            self.get_release_info(release_id),
+            self.get_release_series(release_id, limit=series_limit)
+        )
+        if not release_info or not series_data:
             return None
         
         # Build combined response
@@ -98,20 +125,24 @@ class FREDAPISecure:
             }
         }
         
-        # Get observations for each series
-        for series in series_data['seriess']:
-            series_id = series['id']
-            print(f"  Getting observations for: {series_id}")
-            
-            obs_data = self.get_series_observations(series_id, limit=obs_limit)
+        # Get observations for all series concurrently
+        tasks = [self.get_series_observations(s['id'], limit=obs_limit) for s in series_data['seriess']]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Release %s: getting observations for %s", release_id, ', '.join(s['id'] for s in series_data['seriess']))
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        for series, obs_data in zip(series_data['seriess'], results):
+            if isinstance(obs_data, Exception):
+                logger.error("Error getting observations for %s: %s", series['id'], obs_data)
+                continue
             if obs_data and 'observations' in obs_data:
-                series_with_obs = series.copy()
-                series_with_obs['observations'] = obs_data['observations']
-                result['series'].append(series_with_obs)
+                # series comes from this call's own response, so attach in place
+                series['observations'] = obs_data['observations']
+                result['series'].append(series)
         
         return result
 
-def main():
+async def main():
     try:
         # Initialize API client
         fred = FREDAPISecure()
@@ -122,7 +153,7 @@ def main():
         
         # Test 1: Get available releases
         print("1. Getting available releases...")
-        releases = fred.get_releases(limit=5)
+        releases = await fred.get_releases(limit=5)
         if releases:
             print(f"Found {releases.get('count', 0)} total releases")
             for release in releases['releases']:
@@ -134,7 +165,7 @@ def main():
         print(f"2. Testing with Consumer Price Index (ID: {release_id})")
         
         # Get release observations using workaround
-        cpi_data = fred.get_release_observations_workaround(
+        cpi_data = await fred.get_release_observations_workaround(
             release_id=release_id,
             series_limit=3,
             obs_limit=5
@@ -156,6 +187,8 @@ def main():
                 for observation in obs[-3:]:  # Last 3 observations
                     print(f"    {observation['date']}: {observation['value']}")
         
+        await fred.close()
+        
         print("\n" + "="*50)
         print("✅ All tests completed successfully!")
         
@@ -169,4 +202,4 @@ def main():
         print(f"❌ Error: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
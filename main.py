@@ -4,21 +4,42 @@ FRED Explorer FastAPI Backend with SQLite Caching
 Serves Vue.js frontend and provides cached FRED API endpoints
 """
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, ORJSONResponse, Response
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, Dict, Any
+import hashlib
 import os
+import re
+import asyncio
 from fred_api_cached import FREDAPICached
-from database import init_database
+from database import db
 
-app = FastAPI(title="FRED Explorer", description="Federal Reserve Economic Data Explorer with SQLite Caching")
+app = FastAPI(
+    title="FRED Explorer",
+    description="Federal Reserve Economic Data Explorer with SQLite Caching",
+    default_response_class=ORJSONResponse
+)
+
+INDEX_HTML = "static/index.html"
+
+def _read_file(path):
+    """Read a whole file as bytes"""
+    with open(path, 'rb') as f:
+        return f.read()
 
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
-    init_database()
+    await db.init_db()
+    # Periodic ANALYZE and WAL checkpoint
+    app.state.housekeeping_task = asyncio.create_task(db.housekeeping_loop())
+    # Keep the SPA shell in memory; it only changes on deploy
+    app.state.index_html = None
+    if os.path.exists(INDEX_HTML):
+        app.state.index_html = await asyncio.to_thread(_read_file, INDEX_HTML)
+        app.state.index_etag = f'"{hashlib.blake2b(app.state.index_html, digest_size=16).hexdigest()}"'
 
 # Initialize FRED API client with caching
 try:
@@ -27,19 +48,31 @@ except ValueError as e:
     print(f"Warning: FRED API not configured - {e}")
     fred_client = None
 
+# Stop housekeeping and close pooled HTTP connections on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.housekeeping_task.cancel()
+    if fred_client:
+        await fred_client.close()
+
 # Pydantic models for request/response
+# Limits follow the FRED API maximums (1000 series, 100000 observations per request)
 class SeriesRequest(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+    
     series_id: str
-    limit: Optional[int] = 100
+    limit: int = Field(100, ge=1, le=100000)
     observation_start: Optional[str] = None
     observation_end: Optional[str] = None
-    force_refresh: Optional[bool] = False
+    force_refresh: bool = False
 
 class ReleaseRequest(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+    
     release_id: int
-    series_limit: Optional[int] = 10
-    obs_limit: Optional[int] = 50
-    force_refresh: Optional[bool] = False
+    series_limit: int = Field(10, ge=1, le=1000)
+    obs_limit: int = Field(50, ge=1, le=100000)
+    force_refresh: bool = False
 
 # API Routes
 @app.get("/api/releases")
@@ -180,13 +213,31 @@ async def health_check():
 
 # Serve the Vue.js app
 @app.get("/")
-async def serve_app():
+async def serve_app(request: Request):
     """Serve the main Vue.js application"""
-    return FileResponse("static/index.html")
+    if app.state.index_html is None:
+        return FileResponse(INDEX_HTML)
+    
+    # no-cache: browsers keep the page but revalidate it against the ETag on every load
+    headers = {"Cache-Control": "no-cache", "ETag": app.state.index_etag}
+    if request.headers.get("if-none-match") == app.state.index_etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=app.state.index_html, media_type="text/html", headers=headers)
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that lets browsers keep content-hashed assets (e.g. app.3f9a1c2b.js) forever"""
+    
+    HASHED_NAME = re.compile(r"\.[0-9a-fA-F]{8,}\.[^./]+$")
+    
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if self.HASHED_NAME.search(str(full_path)):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
 
 # Mount static files (for any additional assets)
 if os.path.exists("static"):
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 
 if __name__ == "__main__":
     import uvicorn
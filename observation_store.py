@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+FRED Explorer Observation Store
+Packed per-series binary files for cached observations
+"""
+
+import bisect
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Store configuration
+OBSERVATIONS_DIR = "./observations"
+
+# File layout: a format tag and realtime_start/realtime_end header, followed by one
+# record per observation in date order: days since 1970-01-01 (int32), value
+# (float64, NaN if missing) and the number of decimals FRED printed (int8, -1 if
+# the text is not plain fixed-point), so values render back exactly as received
+_MAGIC = b"OBS2"
+_HEADER = struct.Struct("<4s10s10s")
+_RECORD = struct.Struct("<idb")
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_SERIES_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+_FIXED_POINT_PATTERN = re.compile(r"-?\d+(?:\.(\d+))?")
+
+# Per-series writer locks shared by every store in the process; writes run in
+# worker threads (asyncio.to_thread) and must not depend on the OS file lock
+# alone to exclude each other
+_WRITE_LOCKS: dict[str, threading.Lock] = {}
+
+def _encode_value(text):
+    """Convert a FRED observation value to (float, decimals); "." marks a missing value"""
+    if text is None or text == '.':
+        return math.nan, 0
+    value = float(text)
+    match = _FIXED_POINT_PATTERN.fullmatch(text)
+    if match:
+        decimals = len(match.group(1) or '')
+        if f"{value:.{decimals}f}" == text:
+            return value, decimals
+    return value, -1
+
+def _day(iso_date: str):
+    """Day offset of an ISO date string"""
+    return date.fromisoformat(iso_date).toordinal() - _EPOCH_ORDINAL
+
+@lru_cache(maxsize=65536)
+def _iso_date(day: int):
+    """ISO date for a day offset; cached because the same dates recur across series and requests"""
+    return date.fromordinal(day + _EPOCH_ORDINAL).isoformat()
+
+@contextmanager
+def _exclusive(lock_path: str):
+    """Hold an advisory lock on lock_path, so only one writer at a time merges a series file"""
+    with open(lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after ~10 seconds; keep waiting
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class ObservationStore:
+    """One file per series, so the most recent N observations are a single seek and read"""
+    
+    def __init__(self, directory: str = OBSERVATIONS_DIR):
+        self.directory = directory
+    
+    def _path(self, series_id: str):
+        """Get the file path for a series"""
+        if not _SERIES_ID_PATTERN.fullmatch(series_id):
+            raise ValueError(f"Invalid series id: {series_id!r}")
+        return os.path.join(self.directory, f"{series_id}.bin")
+    
+    def _read_all(self, path: str):
+        """Read every record of a series file as {day: (value, decimals)}; empty for another file format"""
+        with open(path, 'rb') as f:
+            if f.read(_HEADER.size)[:len(_MAGIC)] != _MAGIC:
+                return {}
+            return {day: (value, decimals) for day, value, decimals in _RECORD.iter_unpack(f.read())}
+    
+    def write(self, series_id: str, observations_data: list):
+        """Merge observations into the series file; returns the number of stored records"""
+        path = self._path(series_id)
+        os.makedirs(self.directory, exist_ok=True)
+        
+        # Read-merge-replace must not overlap with another writer of this series,
+        # or the later os.replace drops the earlier writer's records
+        with _WRITE_LOCKS.setdefault(series_id, threading.Lock()), _exclusive(os.path.splitext(path)[0] + '.lock'):
+            try:
+                records = self._read_all(path)
+            except FileNotFoundError:
+                records = {}
+            
+            for obs_data in observations_data:
+                records[_day(obs_data['date'])] = _encode_value(obs_data.get('value'))
+            
+            latest = observations_data[-1] if observations_data else {}
+            header = _HEADER.pack(
+                _MAGIC,
+                latest.get('realtime_start', '').encode(),
+                latest.get('realtime_end', '').encode()
+            )
+            
+            # Write to a temp file and swap it in so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(header)
+                    f.write(b''.join(_RECORD.pack(day, *records[day]) for day in sorted(records)))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        return len(records)
+    
+    def read(self, series_id: str, limit: int = 1000, observation_start: str = None, observation_end: str = None):
+        """
+        Get the observations a FRED request with these arguments returns: the first
+        `limit` records on or after observation_start and on or before observation_end,
+        newest first. None if the series is not stored
+        """
+        if not _SERIES_ID_PATTERN.fullmatch(series_id):
+            return None
+        try:
+            with open(self._path(series_id), 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                if len(view) < _HEADER.size or view[:len(_MAGIC)] != _MAGIC:
+                    return None
+                _, *realtime = _HEADER.unpack_from(view)
+                realtime_start, realtime_end = (field.rstrip(b'\0').decode() for field in realtime)
+                # Records are sorted by day, so the requested range is two bisects
+                # over record indexes without unpacking the whole file
+                count = (len(view) - _HEADER.size) // _RECORD.size
+                day_at = lambda index: _RECORD.unpack_from(view, _HEADER.size + index * _RECORD.size)[0]
+                first = 0 if observation_start is None else bisect.bisect_left(range(count), _day(observation_start), key=day_at)
+                last = count if observation_end is None else bisect.bisect_right(range(count), _day(observation_end), key=day_at)
+                last = min(last, first + limit)
+                # Walk record offsets backwards so the slice comes out newest first with no sort
+                records = [
+                    _RECORD.unpack_from(view, _HEADER.size + index * _RECORD.size)
+                    for index in range(last - 1, first - 1, -1)
+                ]
+        except FileNotFoundError:
+            return None
+        
+        # Hot loop: cached date strings and inline formatting, with value != value
+        # as the NaN check; decimals < 0 marks text that was not plain fixed-point
+        iso_date = _iso_date
+        return [
+            {
+                'date': iso_date(day),
+                'value': '.' if value != value else (f"{value:.{decimals}f}" if decimals >= 0 else f"{value:.15g}"),
+                'realtime_start': realtime_start,
+                'realtime_end': realtime_end
+            }
+            for day, value, decimals in records
+        ]
+    
+    def count(self):
+        """Count stored observations across all series files from their sizes alone (no file is opened)"""
+        if not os.path.isdir(self.directory):
+            return 0
+        return sum(
+            max(0, (entry.stat().st_size - _HEADER.size) // _RECORD.size)
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith('.bin')
+        )
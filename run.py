@@ -1,21 +1,38 @@
 #!/usr/bin/env python3
 """
 FRED Explorer Startup Script
+Production server: one worker per CPU, no auto-reload (see run_dev.py for development)
 """
 
+import os
+import sys
 import uvicorn
+from database import init_database
 
 if __name__ == "__main__":
+    workers = os.cpu_count() or 1
+    
     print("🚀 Starting FRED Explorer...")
+    print(f"⚙️  Workers: {workers}")
     print("📊 Access the application at: http://localhost:8888")
     print("🔗 API documentation at: http://localhost:8888/docs")
     print("⏹️  Press Ctrl+C to stop the server")
     print()
     
+    # Create or rebuild the schema once here; workers started together would
+    # otherwise race each other through drop_all/create_all
+    init_database()
+    
+    # Workers share two stores: fred_data.db (WAL + busy_timeout) and observations/,
+    # whose per-series files are merged under an advisory lock file in ObservationStore.write
+    
     uvicorn.run(
         "main:app", 
         host="0.0.0.0", 
         port=8888,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+        workers=workers,
+        # uvloop is not available on Windows
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        log_level="warning"
+    )